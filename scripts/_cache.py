@@ -0,0 +1,63 @@
+"""
+Small on-disk JSON cache and atomic file writing used by update_data.py.
+
+Each key is stored as ``{directory}/{key}.json`` with the envelope
+``{"fetched_at": <epoch seconds>, "data": {...}}``.
+"""
+
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import IO, Any, Dict, Iterator, Optional
+
+import orjson
+
+
+@contextmanager
+def atomic_write(path: str, buffering: int = -1) -> Iterator[IO[bytes]]:
+    """Write ``path`` via a temp file in the same directory, replaced into place on success.
+
+    Readers (e.g. the site polling data.json) never see a partially written file.
+    """
+    tmp = tempfile.NamedTemporaryFile(
+        mode='wb', dir=os.path.dirname(path), prefix='.', suffix='.tmp', delete=False, buffering=buffering
+    )
+    try:
+        with tmp:
+            yield tmp
+        os.chmod(tmp.name, 0o644)
+        os.replace(tmp.name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp.name)
+        except OSError:
+            pass
+        raise
+
+
+class FileCache:
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached envelope for ``key``, or None if missing/corrupt."""
+        try:
+            with open(self.path(key), 'rb') as f:
+                envelope = orjson.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if not isinstance(envelope, dict) or not isinstance(envelope.get('data'), dict):
+            return None
+        if not isinstance(envelope.get('fetched_at'), (int, float)):
+            return None
+        return envelope
+
+    def store(self, key: str, data: Dict[str, Any]) -> None:
+        """Write ``data`` for ``key`` atomically, stamped with the current time."""
+        os.makedirs(self.directory, exist_ok=True)
+        with atomic_write(self.path(key)) as f:
+            f.write(orjson.dumps({'fetched_at': time.time(), 'data': data}))
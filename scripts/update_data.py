@@ -4,26 +4,42 @@ Fetch stock data for a watchlist and produce a JSON file consumable by the stati
 
 Inputs:
   - ../watchlist.txt : newline-separated tickers (e.g., AAPL)
-  - Environment: ALPHA_VANTAGE_KEY
+  - Environment: ALPHA_VANTAGE_KEY, MAX_WORKERS (optional, default 8),
+    ALPHA_VANTAGE_RPM (optional, default 5)
 
 Outputs:
   - ../site/data.json : consolidated dashboard data
   - ../site/alert_content.txt : only created if any stock change > 2% or < -2%
+  - ../.cache/alpha_vantage/{ticker}.json : cached daily series, reused between runs
+  - ../.cache/company_names/{ticker}.json : cached company names (refreshed every 30 days)
 
 Dependencies:
   - yfinance
   - requests
+  - orjson
+  - numpy
 """
 
-import json
+import heapq
 import os
+import random
 import sys
+import threading
 import time
-from datetime import datetime, timezone
-from typing import List, Dict, Any
-
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Callable, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import orjson
 import requests
 import yfinance as yf
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from _cache import FileCache, atomic_write
 
 
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -31,141 +47,482 @@ WATCHLIST_PATH = os.path.join(ROOT_DIR, 'watchlist.txt')
 SITE_DIR = os.path.join(ROOT_DIR, 'site')
 DATA_JSON_PATH = os.path.join(SITE_DIR, 'data.json')
 ALERT_PATH = os.path.join(SITE_DIR, 'alert_content.txt')
+CACHE_DIR = os.path.join(ROOT_DIR, '.cache')
+
+ALPHA_VANTAGE_CACHE = FileCache(os.path.join(CACHE_DIR, 'alpha_vantage'))
+# Daily bars kept per ticker in the cache (matches outputsize=compact)
+ALPHA_VANTAGE_CACHE_DAYS = 100
+# Cached series lifetime while the US market is trading vs. otherwise
+ALPHA_VANTAGE_TTL_TRADING = 6 * 60 * 60
+ALPHA_VANTAGE_TTL_CLOSED = 24 * 60 * 60
+MARKET_TZ = ZoneInfo('America/New_York')
+
+# Symbol whose Yahoo marketState is used as the market status for every stock
+MARKET_STATE_SYMBOL = 'SPY'
+
+COMPANY_NAME_CACHE = FileCache(os.path.join(CACHE_DIR, 'company_names'))
+# Company names are refreshed after this long
+COMPANY_NAME_TTL = 30 * 24 * 60 * 60
+
+# Worker threads used to fetch tickers concurrently (override with MAX_WORKERS)
+DEFAULT_MAX_WORKERS = 8
+
+# yfinance fast_info attribute for each numeric quote field (avoids the .info scrape)
+FAST_INFO_KEYS = {
+    'currentPrice': 'last_price',
+    'lastPrice': 'last_price',
+    'open': 'open',
+    'previousClose': 'previous_close',
+    'volume': 'last_volume',
+    'fiftyTwoWeekHigh': 'year_high',
+    'fiftyTwoWeekLow': 'year_low',
+}
+
+# Numeric fields returned by fetch_current_open_name:
+# (output key, info keys to try in order, daily-bar column and row or None)
+QUOTE_FIELDS = (
+    ('current', ('currentPrice', 'lastPrice'), 'Close', -1),
+    ('open', ('open',), 'Open', -1),
+    ('previousClose', ('previousClose',), 'Close', -2),
+    ('volume', ('volume',), 'Volume', -1),
+    ('fiftyTwoWeekHigh', ('fiftyTwoWeekHigh',), None, None),
+    ('fiftyTwoWeekLow', ('fiftyTwoWeekLow',), None, None),
+)
+
+# Alert when a stock moves more than this many percent from the day's open
+ALERT_THRESHOLD_PCT = 2.0
+
+# Write buffer for data.json (amortizes syscalls while streaming stocks)
+OUTPUT_BUFFER_SIZE = 1 << 16
+
+# Symbols per batched Yahoo download request
+YAHOO_BATCH_SIZE = 10
+
+# Alpha Vantage requests per minute (free tier is 5; override with ALPHA_VANTAGE_RPM)
+DEFAULT_ALPHA_VANTAGE_RPM = 5
+# Retries on timeouts, HTTP 429 and 5xx before giving up on a ticker
+ALPHA_VANTAGE_MAX_RETRIES = 3
+# (connect, read) timeouts so one slow response cannot hold a worker for long
+ALPHA_VANTAGE_TIMEOUT = (3.05, 10)
+
+
+def make_http_adapter(pool_size: int) -> HTTPAdapter:
+    """Return an HTTPS adapter with ``pool_size`` keep-alive connections.
+
+    Only connection errors are retried here; timeouts and error statuses are retried
+    by download_alpha_vantage_series so each attempt goes through the rate limiter.
+    """
+    return HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=Retry(connect=3, read=0, status=0, backoff_factor=0.5),
+    )
+
+
+# Shared keep-alive session; the connection pool is safe to use from worker threads.
+# main() resizes the pool to match MAX_WORKERS.
+_SESSION = requests.Session()
+_SESSION.mount('https://', make_http_adapter(DEFAULT_MAX_WORKERS))
+
+
+class RateLimiter:
+    """Sliding-window limiter shared by all worker threads.
+
+    Proactively caps requests at ``rpm`` per 60 seconds and reactively
+    pauses every caller when the server asks for a ``Retry-After`` delay.
+    """
+
+    def __init__(self, rpm: int, window: float = 60.0):
+        self.rpm = rpm
+        self.window = window
+        self._timestamps: deque[float] = deque()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent, then record it."""
+        while True:
+            # Work out the wait under the lock but sleep outside it, so pause()
+            # from another worker takes effect immediately
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.window:
+                    self._timestamps.popleft()
+                if now < self._resume_at:
+                    wait = self._resume_at - now
+                elif len(self._timestamps) >= self.rpm:
+                    wait = self.window - (now - self._timestamps[0])
+                else:
+                    self._timestamps.append(now)
+                    return
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all callers for ``seconds`` (e.g. from a Retry-After header)."""
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
 
 
 def read_watchlist(path: str) -> List[str]:
     if not os.path.exists(path):
         raise FileNotFoundError(f"Watchlist not found at {path}")
-    tickers: List[str] = []
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            t = line.strip()
-            if t and not t.startswith('#'):
-                tickers.append(t)
-    return tickers
+    # One bulk read and decode instead of iterating the file line by line
+    with open(path, 'rb') as f:
+        lines = f.read().decode('utf-8').splitlines()
+    return [t for t in (line.strip() for line in lines) if t and not t.startswith('#')]
 
 
-def fetch_alpha_vantage_series(ticker: str, api_key: str) -> tuple[List[float], List[str]]:
-    """Return last 30 closing prices and dates (oldest -> newest)."""
+def retry_after_seconds(resp: requests.Response) -> Optional[float]:
+    """Return the Retry-After delay in seconds, if the server sent one."""
+    value = resp.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def alpha_vantage_ttl(now: Optional[datetime] = None) -> float:
+    """Return how long a cached daily series stays fresh, in seconds."""
+    now = now or datetime.now(MARKET_TZ)
+    minutes = now.hour * 60 + now.minute
+    if now.weekday() < 5 and 9 * 60 + 30 <= minutes < 16 * 60:
+        return ALPHA_VANTAGE_TTL_TRADING
+    return ALPHA_VANTAGE_TTL_CLOSED
+
+
+def last_market_close(now: Optional[datetime] = None) -> datetime:
+    """Return the most recent weekday 16:00 ET close at or before ``now``."""
+    now = now or datetime.now(MARKET_TZ)
+    close = now.astimezone(MARKET_TZ).replace(hour=16, minute=0, second=0, microsecond=0)
+    if close > now:
+        close -= timedelta(days=1)
+    while close.weekday() >= 5:
+        close -= timedelta(days=1)
+    return close
+
+
+def alpha_vantage_cache_fresh(fetched_at: float, now: Optional[datetime] = None) -> bool:
+    """Return True if a series fetched at ``fetched_at`` (epoch) can be reused.
+
+    A series fetched before the latest market close is missing that day's closing
+    bar, so it is always stale; otherwise the 6h/24h TTL caps its age.
+    """
+    now = now or datetime.now(MARKET_TZ)
+    if fetched_at < last_market_close(now).timestamp():
+        return False
+    return now.timestamp() - fetched_at < alpha_vantage_ttl(now)
+
+
+def download_alpha_vantage_series(
+    ticker: str, api_key: str, limiter: Optional[RateLimiter] = None
+) -> Optional[Dict[str, Any]]:
+    """Return the raw 'Time Series (Daily)' mapping, or None if not available.
+
+    Timeouts, HTTP 429 and 5xx responses that are still failing after the last
+    retry also return None, so the caller can fall back to its cache.
+    """
     url = (
         'https://www.alphavantage.co/query'
         f'?function=TIME_SERIES_DAILY&symbol={ticker}&apikey={api_key}&outputsize=compact'
     )
-    resp = requests.get(url, timeout=30)
+    for attempt in range(ALPHA_VANTAGE_MAX_RETRIES + 1):
+        last_attempt = attempt == ALPHA_VANTAGE_MAX_RETRIES
+        if limiter is not None:
+            limiter.acquire()
+        try:
+            resp = _SESSION.get(url, timeout=ALPHA_VANTAGE_TIMEOUT)
+        except requests.Timeout:
+            if last_attempt:
+                print(f"Alpha Vantage timed out for {ticker}, giving up after {attempt + 1} attempts", file=sys.stderr)
+                return None
+            print(f"Alpha Vantage timed out for {ticker} (attempt {attempt + 1}), retrying", file=sys.stderr)
+            time.sleep(random.uniform(0, 2 ** attempt))
+            continue
+        delay = retry_after_seconds(resp)
+        if delay is not None and limiter is not None:
+            limiter.pause(delay)
+        if resp.status_code == 429 or resp.status_code >= 500:
+            if last_attempt:
+                print(
+                    f"Alpha Vantage returned HTTP {resp.status_code} for {ticker}, "
+                    f"giving up after {attempt + 1} attempts",
+                    file=sys.stderr,
+                )
+                return None
+            print(
+                f"Alpha Vantage returned HTTP {resp.status_code} for {ticker} (attempt {attempt + 1}), retrying",
+                file=sys.stderr,
+            )
+            # Jittered exponential backoff unless the limiter already honours Retry-After
+            if delay is None or limiter is None:
+                time.sleep(delay if delay is not None else random.uniform(0, 2 ** attempt))
+            continue
+        break
     resp.raise_for_status()
-    data = resp.json()
+    data = orjson.loads(resp.content)
     series = data.get('Time Series (Daily)')
-    if not isinstance(series, dict):
-        # Alpha Vantage may rate-limit; return empty lists if not available
-        return [], []
-    # Sort dates ascending, take last 30
-    dates = sorted(series.keys())[-30:]
+    return series if isinstance(series, dict) else None
+
+
+def fetch_alpha_vantage_series(
+    ticker: str, api_key: str, limiter: Optional[RateLimiter] = None
+) -> tuple[List[float], List[str]]:
+    """Return last 30 closing prices and dates (oldest -> newest)."""
+    cached = ALPHA_VANTAGE_CACHE.load(ticker)
+    if cached is not None and alpha_vantage_cache_fresh(cached['fetched_at']):
+        series = cached['data']
+    else:
+        try:
+            series = download_alpha_vantage_series(ticker, api_key, limiter)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Alpha Vantage request failed for {ticker}: {e}", file=sys.stderr)
+            series = None
+        if series is None:
+            # Alpha Vantage may rate-limit or fail; fall back to stale cache or empty lists
+            if cached is None:
+                return [], []
+            series = cached['data']
+        else:
+            # Past daily bars never change, so merge new bars into the cached ones
+            if cached is not None:
+                series = {**cached['data'], **series}
+            # Keep the newest bars (ascending) without sorting the whole merged series
+            series = {d: series[d] for d in sorted(heapq.nlargest(ALPHA_VANTAGE_CACHE_DAYS, series))}
+            try:
+                ALPHA_VANTAGE_CACHE.store(ticker, series)
+            except OSError as e:
+                print(f"Could not cache series for {ticker}: {e}", file=sys.stderr)
+    # Take the newest 30 bars without sorting the whole series, then order them
+    # oldest -> newest and read only their closes
+    latest = heapq.nlargest(30, series.items(), key=lambda kv: kv[0])[::-1]
     closes: List[float] = []
-    for d in dates:
+    dates: List[str] = []
+    skipped = 0
+    for d, bar in latest:
         try:
-            closes.append(float(series[d]['4. close']))
+            close = float(bar['4. close'])
         except Exception:
+            skipped += 1
             continue
+        # Keep dates aligned with closes: record both only when the close parses
+        closes.append(close)
+        dates.append(d)
+    if skipped:
+        print(f"Skipped {skipped} malformed Alpha Vantage bars for {ticker}", file=sys.stderr)
     return closes, dates
 
 
-def safe_get_info(t: yf.Ticker, key: str):
-    # yfinance.info can be slow/partial; try fast_info fallback
-    try:
-        info = t.info or {}
-        if key in info and info[key] is not None:
-            return info[key]
-    except Exception:
-        pass
+def fetch_daily_bars(tickers: List[str]) -> Dict[str, Any]:
+    """Return the last two daily bars per ticker, downloaded in batches."""
+    bars: Dict[str, Any] = {}
+    for i in range(0, len(tickers), YAHOO_BATCH_SIZE):
+        chunk = tickers[i:i + YAHOO_BATCH_SIZE]
+        try:
+            df = yf.download(
+                tickers=' '.join(chunk),
+                period='2d',
+                group_by='ticker',
+                # Raw prices: adjusted closes would skew previousClose on ex-dividend days
+                auto_adjust=False,
+                threads=True,
+                progress=False,
+            )
+        except Exception as e:
+            print(f"Error downloading quotes for {' '.join(chunk)}: {e}", file=sys.stderr)
+            continue
+        if df is None or df.empty:
+            continue
+        for ticker in chunk:
+            try:
+                frame = df[ticker] if df.columns.nlevels > 1 else df
+            except KeyError:
+                continue
+            frame = frame.dropna(how='all')
+            if not frame.empty:
+                bars[ticker] = frame
+    return bars
+
+
+def bar_value(bars: Any, column: str, index: int) -> Optional[float]:
+    """Read one value from a daily-bar frame, or None if it is missing."""
+    if bars is None:
+        return None
     try:
-        fi = getattr(t, 'fast_info', None)
-        if fi is not None and hasattr(fi, key):
-            return getattr(fi, key)
-    except Exception:
-        pass
-    return None
+        value = float(bars[column].iloc[index])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+    # NaN marks a missing bar
+    return None if value != value else value
 
 
-def fetch_current_open_name(ticker: str) -> Dict[str, Any]:
-    t = yf.Ticker(ticker)
-    # Get info once (expensive call)
-    info = {}
+def cached_company_name(ticker: str) -> Optional[str]:
+    """Return the cached company name for ``ticker`` if it is recent enough."""
+    cached = COMPANY_NAME_CACHE.load(ticker)
+    if cached is None or time.time() - cached['fetched_at'] >= COMPANY_NAME_TTL:
+        return None
+    name = cached['data'].get('companyName')
+    return name if isinstance(name, str) and name else None
+
+
+def store_company_name(ticker: str, name: str) -> None:
     try:
-        info = t.info or {}
-    except Exception:
-        pass
-
-    # Current price
-    current = None
-    current = safe_get_info(t, 'currentPrice')
-    if current is None:
-        current = safe_get_info(t, 'lastPrice')
-    if current is None:
-        try:
-            hist = t.history(period='1d', interval='1m')
-            if not hist.empty:
-                current = float(hist['Close'].iloc[-1])
-        except Exception:
-            current = None
+        COMPANY_NAME_CACHE.store(ticker, {'companyName': name})
+    except OSError as e:
+        print(f"Could not cache company name for {ticker}: {e}", file=sys.stderr)
 
-    # Open price
-    day_open = None
-    day_open = safe_get_info(t, 'open')
-    if day_open is None:
-        try:
-            hist_d = t.history(period='1d')
-            if not hist_d.empty:
-                day_open = float(hist_d['Open'].iloc[0])
-        except Exception:
-            day_open = None
 
-    # Previous close
-    previous_close = None
-    previous_close = safe_get_info(t, 'previousClose')
-    if previous_close is None:
-        try:
-            hist_2d = t.history(period='2d')
-            if not hist_2d.empty and len(hist_2d) > 1:
-                previous_close = float(hist_2d['Close'].iloc[-2])
-        except Exception:
-            previous_close = None
+def market_open_by_clock(now: Optional[datetime] = None) -> bool:
+    """Approximate Yahoo's REGULAR/PRE/PREPRE market states from the US exchange clock."""
+    now = now or datetime.now(MARKET_TZ)
+    return now.weekday() < 5 and now.hour < 16
+
 
-    # Volume
-    volume = None
-    volume = safe_get_info(t, 'volume')
-    if volume is None:
+def fetch_market_open() -> bool:
+    """Return whether the US market is open, from one Yahoo lookup shared by every stock."""
+    try:
+        market_state = (yf.Ticker(MARKET_STATE_SYMBOL).info or {}).get('marketState')
+    except Exception:
+        market_state = None
+    if not market_state:
+        # Yahoo gave no answer; approximate from the exchange clock
+        return market_open_by_clock()
+    return market_state.upper() in ['REGULAR', 'PRE', 'PREPRE']  # Consider pre-market as "open"
+
+
+def safe_get_info(get_info: Callable[[], Dict[str, Any]], fast_info: Any, key: str):
+    # fast_info skips yfinance's slow .info scrape; only call get_info() (memoized
+    # by the caller) for keys fast_info does not carry or could not answer
+    attr = FAST_INFO_KEYS.get(key)
+    if attr is not None and fast_info is not None:
         try:
-            hist_d = t.history(period='1d')
-            if not hist_d.empty:
-                volume = float(hist_d['Volume'].iloc[-1])
+            value = getattr(fast_info, attr)
+            # NaN means fast_info had no value
+            if value is not None and value == value:
+                return value
         except Exception:
-            volume = None
-
-    # 52-week high/low
-    fifty_two_week_high = info.get('fiftyTwoWeekHigh') or safe_get_info(t, 'fiftyTwoWeekHigh')
-    fifty_two_week_low = info.get('fiftyTwoWeekLow') or safe_get_info(t, 'fiftyTwoWeekLow')
+            pass
+    return get_info().get(key)
 
-    # Market status (is market open?)
-    market_state = info.get('marketState', 'REGULAR').upper()
-    is_market_open = market_state in ['REGULAR', 'PRE', 'PREPRE']  # Consider pre-market as "open"
 
-    # Company name
-    company_name = None
-    company_name = info.get('longName') or info.get('shortName')
+def fetch_current_open_name(ticker: str, bars: Any = None) -> Dict[str, Any]:
+    """Collect quote fields, preferring the pre-downloaded daily bars."""
+    t = yf.Ticker(ticker)
+    try:
+        fast_info = getattr(t, 'fast_info', None)
+    except Exception:
+        fast_info = None
+
+    # info is an expensive scrape: fetch it at most once, and only when needed
+    info: Optional[Dict[str, Any]] = None
+
+    def get_info() -> Dict[str, Any]:
+        nonlocal info
+        if info is None:
+            try:
+                info = t.info or {}
+            except Exception:
+                info = {}
+        return info
+
+    # Daily history for the last-resort fallback: the batch frame when we have one,
+    # otherwise a single per-ticker request made only if a fallback needs it
+    hist = bars
+    hist_fetched = bars is not None
+
+    def hist_value(column: str, index: int) -> Optional[float]:
+        nonlocal hist, hist_fetched
+        if not hist_fetched:
+            hist_fetched = True
+            try:
+                hist = t.history(period='2d')
+            except Exception:
+                hist = None
+        return bar_value(hist, column, index)
+
+    # Numeric quote fields: batch daily bars, then fast_info/info, then history
+    quote: Dict[str, Any] = {}
+    for field, info_keys, column, row in QUOTE_FIELDS:
+        value = bar_value(bars, column, row) if column else None
+        for key in info_keys:
+            if value is not None:
+                break
+            value = safe_get_info(get_info, fast_info, key)
+        if value is None and column:
+            value = hist_value(column, row)
+        quote[field] = value
+
+    # Company name (effectively static, so served from the disk cache when possible)
+    company_name = cached_company_name(ticker)
+    if company_name is None:
+        company_name = get_info().get('longName') or get_info().get('shortName')
+        if company_name:
+            store_company_name(ticker, company_name)
     if not company_name:
         company_name = ticker
 
-    return {
-        'current': current,
-        'open': day_open,
-        'previousClose': previous_close,
-        'volume': volume,
-        'fiftyTwoWeekHigh': fifty_two_week_high,
-        'fiftyTwoWeekLow': fifty_two_week_low,
-        'marketOpen': is_market_open,
+    quote['companyName'] = company_name
+    return quote
+
+
+def process_ticker(
+    ticker: str,
+    alpha_key: str,
+    bars: Any = None,
+    limiter: Optional[RateLimiter] = None,
+    market_open: Optional[bool] = None,
+) -> tuple[Dict[str, Any], float]:
+    """Build the dashboard entry for one ticker and its percent change from open."""
+    basics = fetch_current_open_name(ticker, bars)
+    current = basics['current']
+    day_open = basics['open']
+    company_name = basics['companyName']
+    previous_close = basics['previousClose']
+    volume = basics['volume']
+    fifty_two_week_high = basics['fiftyTwoWeekHigh']
+    fifty_two_week_low = basics['fiftyTwoWeekLow']
+    if market_open is None:
+        market_open = market_open_by_clock()
+
+    # Historical series with dates (best-effort; Alpha Vantage can rate-limit)
+    series, dates = fetch_alpha_vantage_series(ticker, alpha_key, limiter)
+
+    # Compute changes
+    if current is None or day_open is None or day_open == 0:
+        day_change = None
+        pct_change = None
+    else:
+        day_change = float(current) - float(day_open)
+        pct_change = (day_change / float(day_open)) * 100.0
+
+    # Compute change from previous close
+    change_from_close = None
+    change_from_close_pct = None
+    if current is not None and previous_close is not None and previous_close > 0:
+        change_from_close = float(current) - float(previous_close)
+        change_from_close_pct = (change_from_close / float(previous_close)) * 100.0
+
+    stock_item = {
+        'ticker': ticker,
         'companyName': company_name,
+        'currentPrice': round(float(current), 2) if isinstance(current, (int, float)) else None,
+        'dayChange': round(float(day_change), 2) if isinstance(day_change, (int, float)) else None,
+        'dayChangePercent': round(float(pct_change), 2) if isinstance(pct_change, (int, float)) else None,
+        'previousClose': round(float(previous_close), 2) if isinstance(previous_close, (int, float)) else None,
+        'changeFromClose': round(float(change_from_close), 2) if isinstance(change_from_close, (int, float)) else None,
+        'changeFromClosePercent': round(float(change_from_close_pct), 2) if isinstance(change_from_close_pct, (int, float)) else None,
+        'volume': int(volume) if isinstance(volume, (int, float)) else None,
+        'fiftyTwoWeekHigh': round(float(fifty_two_week_high), 2) if isinstance(fifty_two_week_high, (int, float)) else None,
+        'fiftyTwoWeekLow': round(float(fifty_two_week_low), 2) if isinstance(fifty_two_week_low, (int, float)) else None,
+        'marketOpen': market_open,
+        'historicalData': [round(float(x), 2) for x in series][-30:],
+        'historicalDates': dates[-30:] if dates else [],
     }
 
+    # Unrounded change from open (NaN if unknown); main() derives alerts from it
+    return stock_item, pct_change if pct_change is not None else float('nan')
+
 
 def main() -> int:
     os.makedirs(SITE_DIR, exist_ok=True)
@@ -181,83 +538,82 @@ def main() -> int:
         print("ALPHA_VANTAGE_KEY is not set in environment", file=sys.stderr)
         return 1
 
-    stocks_out: List[Dict[str, Any]] = []
-    alerts: List[str] = []
-
-    for ticker in tickers:
-        try:
-            basics = fetch_current_open_name(ticker)
-            current = basics['current']
-            day_open = basics['open']
-            company_name = basics['companyName']
-            previous_close = basics['previousClose']
-            volume = basics['volume']
-            fifty_two_week_high = basics['fiftyTwoWeekHigh']
-            fifty_two_week_low = basics['fiftyTwoWeekLow']
-            market_open = basics['marketOpen']
-
-            # Historical series with dates (best-effort; Alpha Vantage can rate-limit)
-            series, dates = fetch_alpha_vantage_series(ticker, alpha_key)
-
-            # Compute changes
-            if current is None or day_open is None or day_open == 0:
-                day_change = None
-                pct_change = None
-            else:
-                day_change = float(current) - float(day_open)
-                pct_change = (day_change / float(day_open)) * 100.0
-
-            # Compute change from previous close
-            change_from_close = None
-            change_from_close_pct = None
-            if current is not None and previous_close is not None and previous_close > 0:
-                change_from_close = float(current) - float(previous_close)
-                change_from_close_pct = (change_from_close / float(previous_close)) * 100.0
-
-            stock_item = {
-                'ticker': ticker,
-                'companyName': company_name,
-                'currentPrice': round(float(current), 2) if isinstance(current, (int, float)) else None,
-                'dayChange': round(float(day_change), 2) if isinstance(day_change, (int, float)) else None,
-                'dayChangePercent': round(float(pct_change), 2) if isinstance(pct_change, (int, float)) else None,
-                'previousClose': round(float(previous_close), 2) if isinstance(previous_close, (int, float)) else None,
-                'changeFromClose': round(float(change_from_close), 2) if isinstance(change_from_close, (int, float)) else None,
-                'changeFromClosePercent': round(float(change_from_close_pct), 2) if isinstance(change_from_close_pct, (int, float)) else None,
-                'volume': int(volume) if isinstance(volume, (int, float)) else None,
-                'fiftyTwoWeekHigh': round(float(fifty_two_week_high), 2) if isinstance(fifty_two_week_high, (int, float)) else None,
-                'fiftyTwoWeekLow': round(float(fifty_two_week_low), 2) if isinstance(fifty_two_week_low, (int, float)) else None,
-                'marketOpen': market_open,
-                'historicalData': [round(float(x), 2) for x in series][-30:],
-                'historicalDates': dates[-30:] if dates else [],
-            }
-            stocks_out.append(stock_item)
-
-            # Alerts
-            if isinstance(pct_change, (int, float)) and (pct_change > 2.0 or pct_change < -2.0):
-                direction = 'up' if pct_change > 2 else 'down'
-                alerts.append(f"STOCK ALERT: {ticker} is {direction} {round(pct_change, 2)}%")
-
-            # Be a bit polite to the free API
-            time.sleep(1.0)
-
-        except Exception as e:
-            print(f"Error processing {ticker}: {e}", file=sys.stderr)
-            continue
-
-    payload = {
-        'lastUpdated': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'),
-        'stocks': stocks_out,
-    }
+    try:
+        max_workers = max(1, int(os.environ.get('MAX_WORKERS', DEFAULT_MAX_WORKERS)))
+    except ValueError:
+        print("MAX_WORKERS must be an integer", file=sys.stderr)
+        return 1
 
-    with open(DATA_JSON_PATH, 'w', encoding='utf-8') as f:
-        json.dump(payload, f, indent=2)
+    try:
+        rpm = max(1, int(os.environ.get('ALPHA_VANTAGE_RPM', DEFAULT_ALPHA_VANTAGE_RPM)))
+    except ValueError:
+        print("ALPHA_VANTAGE_RPM must be an integer", file=sys.stderr)
+        return 1
+    limiter = RateLimiter(rpm)
+    # One pooled connection per worker so keep-alive connections are never discarded
+    _SESSION.mount('https://', make_http_adapter(max_workers))
+
+    # One batched Yahoo download covers open/close/volume for every ticker
+    daily_bars = fetch_daily_bars(tickers)
+    # Market status is looked up once so every stock in data.json agrees
+    market_open = fetch_market_open()
+
+    last_updated = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')
+    stocks_written = 0
+    # Ticker and percent change from open for every stock written, in output order
+    written_tickers: List[str] = []
+    pct_changes: List[float] = []
+    # Results that finished ahead of an earlier watchlist entry, keyed by position
+    pending: Dict[int, Optional[tuple[Dict[str, Any], float]]] = {}
+    next_index = 0
+
+    # Fetch tickers concurrently (network-bound) and stream each stock to disk
+    # as soon as it is next in watchlist order, instead of building the payload.
+    # Output is compact JSON: the site parses it and never shows the raw file.
+    with atomic_write(DATA_JSON_PATH, buffering=OUTPUT_BUFFER_SIZE) as out, \
+            ThreadPoolExecutor(max_workers=max_workers) as executor:
+        out.write(b'{"lastUpdated":' + orjson.dumps(last_updated) + b',"stocks":[')
+        future_to_index = {
+            executor.submit(
+                process_ticker, ticker, alpha_key, daily_bars.get(ticker), limiter, market_open
+            ): i
+            for i, ticker in enumerate(tickers)
+        }
+        for future in as_completed(future_to_index):
+            index = future_to_index[future]
+            try:
+                pending[index] = future.result()
+            except Exception as e:
+                print(f"Error processing {tickers[index]}: {e}", file=sys.stderr)
+                pending[index] = None
+            while next_index in pending:
+                result = pending.pop(next_index)
+                next_index += 1
+                if result is None:
+                    continue
+                stock_item, pct_change = result
+                if stocks_written:
+                    out.write(b',')
+                out.write(orjson.dumps(stock_item, option=orjson.OPT_SERIALIZE_NUMPY))
+                stocks_written += 1
+                written_tickers.append(stock_item['ticker'])
+                pct_changes.append(pct_change)
+        out.write(b']}')
+
+    # Alerts: one vectorized threshold check; only alerting stocks get formatted
+    pct_arr = np.asarray(pct_changes, dtype=np.float64)
+    alerts = [
+        f"STOCK ALERT: {written_tickers[i]} is {'up' if pct_arr[i] > 0 else 'down'} "
+        f"{round(float(pct_arr[i]), 2)}%"
+        for i in np.flatnonzero(np.abs(pct_arr) > ALERT_THRESHOLD_PCT)
+    ]
 
     # Write alert file only if alerts exist
     if alerts:
         with open(ALERT_PATH, 'w', encoding='utf-8') as f:
             f.write('\n'.join(alerts).strip() + '\n')
 
-    print(f"Wrote {DATA_JSON_PATH} with {len(stocks_out)} stocks")
+    print(f"Wrote {DATA_JSON_PATH} with {stocks_written} stocks")
     if alerts:
         print(f"Alerts generated: {len(alerts)} -> {ALERT_PATH}")
     else: